@@ -0,0 +1,254 @@
+"""
+Columnar export - writes processed transactions to month-partitioned Parquet
+and streams them back as Arrow IPC record batches.
+"""
+import math
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .carbon_engine import CarbonEngine
+
+EMISSIONS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("supplier", pa.string()),
+    ("description", pa.string()),
+    ("amount_gbp", pa.float64()),
+    ("quantity", pa.float64()),
+    ("unit", pa.string()),
+    ("category", pa.string()),
+    ("scope", pa.string()),
+    ("emissions_kg_co2e", pa.float64()),
+    ("date", pa.date32()),
+    ("month", pa.string()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+# Arrow IPC end-of-stream marker: continuation token followed by a zero length.
+_IPC_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+# Each export is an immutable snapshot directory; CURRENT names the live one.
+_CURRENT = "CURRENT"
+_SNAPSHOT_PREFIX = "snapshot-"
+_write_lock = threading.Lock()
+_pin_lock = threading.Lock()
+_pins: Counter = Counter()
+
+
+def _opt_str(value, field: str) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"'{field}' must be a string, got {type(value).__name__}")
+
+
+def _opt_float(value, field: str) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"'{field}' must be a number, got {type(value).__name__}")
+    try:
+        number = float(value)
+    except (ValueError, OverflowError):
+        raise ValueError(f"'{field}' must be a number, got {value!r}")
+    if not math.isfinite(number):
+        raise ValueError(f"'{field}' must be a finite number, got {value!r}")
+    return number
+
+
+def _parse_date(value) -> date:
+    """Accept an ISO date or datetime string and return its date part."""
+    if not value:
+        raise ValueError("'date' is required")
+    if not isinstance(value, str):
+        raise ValueError(f"'date' must be an ISO date string, got {type(value).__name__}")
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise ValueError(f"'date' must be an ISO date (YYYY-MM-DD[THH:MM:SS]), got {value!r}")
+
+
+def transactions_to_table(engine: CarbonEngine, transactions: List[Dict]) -> pa.Table:
+    """Run transactions through the carbon engine and collect results column by column.
+
+    Every transaction needs an ISO ``date``; malformed fields raise ValueError naming
+    the transaction index and field.
+    """
+    cols = {name: [] for name in EMISSIONS_SCHEMA.names}
+    for i, t in enumerate(transactions):
+        try:
+            d = _parse_date(t.get("date"))
+            desc = _opt_str(t.get("description"), "description") or ""
+            supplier = _opt_str(t.get("supplier"), "supplier") or ""
+            amount = _opt_float(t.get("amount_gbp"), "amount_gbp")
+            if amount is None:
+                raise ValueError("'amount_gbp' is required")
+            qty = _opt_float(t.get("quantity"), "quantity")
+            unit = _opt_str(t.get("unit"), "unit")
+            category = _opt_str(t.get("category"), "category")
+            tx_id = _opt_str(t.get("id"), "id")
+        except ValueError as e:
+            raise ValueError(f"transaction {i}: {e}")
+        r = engine.process_transaction(desc, amount, qty, unit, category, supplier)
+        if not r:
+            continue
+        if not math.isfinite(r.emissions_kg_co2e):
+            raise ValueError(f"transaction {i}: emissions overflow for amount/quantity")
+        cols["id"].append(tx_id)
+        cols["supplier"].append(supplier)
+        cols["description"].append(desc)
+        cols["amount_gbp"].append(amount)
+        cols["quantity"].append(qty)
+        cols["unit"].append(unit)
+        cols["category"].append(r.category)
+        cols["scope"].append(r.scope)
+        cols["emissions_kg_co2e"].append(r.emissions_kg_co2e)
+        cols["date"].append(d)
+        cols["month"].append(d.strftime("%Y-%m"))
+    return pa.table(cols, schema=EMISSIONS_SCHEMA)
+
+
+def current_snapshot(base_dir: Path) -> Optional[Path]:
+    """Return the live snapshot directory, or None if nothing has been exported."""
+    try:
+        name = (base_dir / _CURRENT).read_text().strip()
+    except FileNotFoundError:
+        return None
+    return base_dir / name
+
+
+def _link_or_copy(src: Path, dst: Path):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _collect_garbage(base_dir: Path, live: Path):
+    with _pin_lock:
+        for path in base_dir.glob(f"{_SNAPSHOT_PREFIX}*"):
+            if path != live and not _pins[path]:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def write_parquet_dataset(table: pa.Table, base_dir: Path) -> List[str]:
+    """Write table as Parquet partitioned by month.
+
+    Every month present in the table is replaced wholesale; other months are kept.
+    The result is staged as a new snapshot and published by atomically swapping
+    CURRENT, so in-flight readers keep seeing the snapshot they opened. Writers are
+    serialised within the process.
+    """
+    base_dir.mkdir(parents=True, exist_ok=True)
+    with _write_lock:
+        previous = current_snapshot(base_dir)
+        staged = base_dir / f"{_SNAPSHOT_PREFIX}{time.time_ns()}"
+        written = []
+        try:
+            ds.write_dataset(
+                table,
+                staged,
+                format="parquet",
+                partitioning=PARTITIONING,
+                basename_template="part-{i}.parquet",
+                file_visitor=lambda f: written.append(f.path),
+            )
+            replaced = {f"month={m}" for m in set(table["month"].to_pylist())}
+            if previous is not None:
+                for src in previous.glob("month=*/*.parquet"):
+                    if src.parent.name not in replaced:
+                        _link_or_copy(src, staged / src.parent.name / src.name)
+            tmp = base_dir / f"{_CURRENT}.tmp"
+            tmp.write_text(staged.name)
+            os.replace(tmp, base_dir / _CURRENT)
+        except BaseException:
+            shutil.rmtree(staged, ignore_errors=True)
+            raise
+        _collect_garbage(base_dir, staged)
+    return written
+
+
+def _build_filter(start_date: Optional[date], end_date: Optional[date], scope: Optional[str]):
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    # Month bounds let the scanner skip whole partitions before reading row groups.
+    if start_date:
+        expr = _and((ds.field("month") >= start_date.strftime("%Y-%m")) & (ds.field("date") >= start_date))
+    if end_date:
+        expr = _and((ds.field("month") <= end_date.strftime("%Y-%m")) & (ds.field("date") <= end_date))
+    if scope:
+        expr = _and(ds.field("scope") == scope)
+    return expr
+
+
+def build_scanner(base_dir: Path, columns: Optional[List[str]] = None, start_date: Optional[date] = None,
+                  end_date: Optional[date] = None, scope: Optional[str] = None) -> Tuple[ds.Scanner, Path]:
+    """Open the live snapshot with projection and filters pushed down to the reader.
+
+    File discovery happens here, so callers can surface errors before streaming starts.
+    The snapshot stays pinned against cleanup until scan_batches finishes with it.
+    Raises FileNotFoundError if nothing has been exported.
+    """
+    with _pin_lock:
+        snapshot = current_snapshot(base_dir)
+        if snapshot is None:
+            raise FileNotFoundError(base_dir / _CURRENT)
+        _pins[snapshot] += 1
+    try:
+        dataset = ds.dataset(snapshot, format="parquet", schema=EMISSIONS_SCHEMA, partitioning=PARTITIONING)
+        scanner = dataset.scanner(columns=columns, filter=_build_filter(start_date, end_date, scope))
+    except BaseException:
+        _release(snapshot)
+        raise
+    return scanner, snapshot
+
+
+def _release(snapshot: Path):
+    with _pin_lock:
+        _pins[snapshot] -= 1
+        if not _pins[snapshot]:
+            del _pins[snapshot]
+
+
+def scan_batches(scanner: ds.Scanner, snapshot: Path) -> Iterator[pa.RecordBatch]:
+    """Lazily yield non-empty record batches, unpinning the snapshot when done."""
+    try:
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch
+    finally:
+        _release(snapshot)
+
+
+def ipc_stream(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream one encapsulated message at a time."""
+    yield schema.serialize().to_pybytes()
+    for batch in batches:
+        yield batch.serialize().to_pybytes()
+    yield _IPC_EOS
+
+
+def scope_totals(table: pa.Table) -> Dict[str, float]:
+    """Sum emissions per scope without materialising rows."""
+    totals = {"scope1": 0.0, "scope2": 0.0, "scope3": 0.0}
+    if not table.num_rows:
+        return totals
+    grouped = table.group_by("scope").aggregate([("emissions_kg_co2e", "sum")])
+    for scope, total in zip(grouped["scope"].to_pylist(), grouped["emissions_kg_co2e_sum"].to_pylist()):
+        key = "scope1" if "Scope 1" in scope else "scope2" if "Scope 2" in scope else "scope3"
+        totals[key] += total
+    return totals
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     upload_dir: Path = Path("uploads")
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
     emission_factors_path: Path = Path("data/emission_factors.json")
+    export_dir: Path = Path("exports/emissions")
 
     class Config:
         env_file = ".env"
@@ -2,13 +2,16 @@
 ESG RegTech Platform - FastAPI Backend
 """
 import json
+from datetime import date
 from pathlib import Path
 from typing import List, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+import pyarrow as pa
 
 from app.config import settings
 from app.carbon_engine import CarbonEngine
@@ -16,6 +19,10 @@ from app.nlp_pipeline import NLPPipeline
 from app.ocr_service import extract_text_from_image, extract_text_from_pdf
 from app.database import init_db
 from app.report_generator import build_esg_scorecard, scorecard_to_html
+from app.columnar_export import (
+    EMISSIONS_SCHEMA, transactions_to_table, write_parquet_dataset, build_scanner, scan_batches, ipc_stream,
+    scope_totals,
+)
 
 
 @asynccontextmanager
@@ -138,3 +145,57 @@ def classify_text(description: str, supplier: str = ""):
     """Classify transaction text to emission category."""
     cat = carbon_engine.classify_from_text(description, supplier)
     return {"category": cat}
+
+
+@app.post("/api/export-parquet")
+def export_parquet(transactions: Optional[List[dict]] = None):
+    """Process transactions (default: synthetic invoices) and write month-partitioned Parquet.
+
+    Each transaction needs a ``date`` as an ISO string (``YYYY-MM-DD``, datetimes are
+    truncated to their date); undated transactions are rejected. Every month touched by
+    the batch is replaced wholesale, so exporting one January transaction drops the rest
+    of January - send complete months.
+    """
+    if transactions is None:
+        path = Path(__file__).parent / "data" / "synthetic_invoices.json"
+        if not path.exists():
+            raise HTTPException(404, "Run: python scripts/generate_synthetic_invoices.py")
+        with open(path) as f:
+            transactions = json.load(f)
+    try:
+        table = transactions_to_table(carbon_engine, transactions)
+    except (ValueError, TypeError, pa.ArrowException) as e:
+        raise HTTPException(400, f"Invalid transaction: {e}")
+    # Build the response before writing so nothing can fail after months are replaced.
+    resp = {
+        "path": str(settings.export_dir),
+        "rows": table.num_rows,
+        "months": sorted(set(table["month"].to_pylist())),
+        "scope_totals": {k: round(v, 2) for k, v in scope_totals(table).items()},
+    }
+    resp["files"] = write_parquet_dataset(table, settings.export_dir)
+    return resp
+
+
+@app.get("/api/emissions-arrow")
+def get_emissions_arrow(
+    columns: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    scope: Optional[int] = Query(None, ge=1, le=3),
+):
+    """Stream exported emissions as Arrow IPC record batches with projection and filters pushed down."""
+    # An empty projection (e.g. "columns=,") means all columns, not zero.
+    cols = [c.strip() for c in (columns or "").split(",") if c.strip()] or None
+    unknown = [c for c in cols or [] if c not in EMISSIONS_SCHEMA.names]
+    if unknown:
+        raise HTTPException(400, f"Unknown columns: {', '.join(unknown)}")
+    try:
+        scanner, snapshot = build_scanner(settings.export_dir, cols, start_date, end_date,
+                                          f"Scope {scope}" if scope else None)
+    except FileNotFoundError:
+        raise HTTPException(404, "No export found. POST /api/export-parquet first.")
+    except (OSError, pa.ArrowException) as e:
+        raise HTTPException(500, f"Could not open export: {e}")
+    return StreamingResponse(ipc_stream(scanner.projected_schema, scan_batches(scanner, snapshot)),
+                             media_type="application/vnd.apache.arrow.stream")
@@ -0,0 +1,123 @@
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.columnar_export import build_scanner, current_snapshot, ipc_stream, scan_batches
+from app.config import settings
+
+TRANSACTIONS = [
+    {"id": "INV-1", "supplier": "British Gas", "description": "Electricity invoice", "amount_gbp": 100.0,
+     "quantity": 500.0, "unit": "kWh", "category": "electricity", "date": "2026-01-10"},
+    {"id": "INV-2", "supplier": "Shell", "description": "Diesel fuel", "amount_gbp": 150.0,
+     "quantity": 100.0, "unit": "litre", "category": "diesel_litres", "date": "2026-01-20"},
+    {"id": "INV-3", "supplier": "Viking Direct", "description": "Printer paper A4", "amount_gbp": 50.0,
+     "category": "paper_tonne", "date": "2026-02-05T09:30:00"},
+]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "export_dir", tmp_path / "exports")
+    return TestClient(main.app)
+
+
+def read_arrow(client, **params):
+    r = client.get("/api/emissions-arrow", params=params)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    return pa.ipc.open_stream(r.content).read_all()
+
+
+def test_export_partitions_by_month(client):
+    r = client.post("/api/export-parquet", json=TRANSACTIONS)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["rows"] == 3
+    assert body["months"] == ["2026-01", "2026-02"]
+    snapshot = current_snapshot(settings.export_dir)
+    assert sorted(p.name for p in snapshot.iterdir()) == ["month=2026-01", "month=2026-02"]
+    assert read_arrow(client).num_rows == 3
+
+
+def test_reexport_replaces_only_matching_months(client):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    r = client.post("/api/export-parquet", json=[TRANSACTIONS[0]])
+    assert r.json()["months"] == ["2026-01"]
+    table = read_arrow(client, columns="id")
+    assert sorted(table["id"].to_pylist()) == ["INV-1", "INV-3"]
+
+
+def test_filters_and_projection(client):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    table = read_arrow(client, columns="id,scope", start_date="2026-01-15", end_date="2026-02-28")
+    assert table.schema.names == ["id", "scope"]
+    assert sorted(table["id"].to_pylist()) == ["INV-2", "INV-3"]
+    table = read_arrow(client, columns="id", scope=2)
+    assert table["id"].to_pylist() == ["INV-1"]
+    assert read_arrow(client, start_date="2026-03-01").num_rows == 0
+
+
+def test_unknown_column_rejected(client):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    r = client.get("/api/emissions-arrow", params={"columns": "id,bogus"})
+    assert r.status_code == 400
+    assert "bogus" in r.json()["detail"]
+
+
+def test_missing_export_returns_404(client):
+    assert client.get("/api/emissions-arrow").status_code == 404
+
+
+@pytest.mark.parametrize("field, value", [
+    ("date", None),
+    ("date", 20260301),
+    ("date", "01/03/2026"),
+    ("amount_gbp", None),
+    ("amount_gbp", "abc"),
+    ("quantity", {"a": 1}),
+    ("supplier", ["x"]),
+    ("amount_gbp", "nan"),
+    ("amount_gbp", "1e999"),
+    ("quantity", 10 ** 400),
+])
+def test_invalid_transaction_returns_400(client, field, value):
+    r = client.post("/api/export-parquet", json=[{**TRANSACTIONS[0], field: value}])
+    assert r.status_code == 400
+    assert f"'{field}'" in r.json()["detail"]
+    assert not settings.export_dir.exists()
+
+
+def test_numeric_id_coerced_to_string(client):
+    r = client.post("/api/export-parquet", json=[{**TRANSACTIONS[0], "id": 5}])
+    assert r.status_code == 200
+    assert read_arrow(client, columns="id")["id"].to_pylist() == ["5"]
+
+
+def test_invalid_export_keeps_existing_months(client):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    r = client.post("/api/export-parquet", json=[{**TRANSACTIONS[0], "amount_gbp": "nan"}])
+    assert r.status_code == 400
+    assert sorted(read_arrow(client, columns="id")["id"].to_pylist()) == ["INV-1", "INV-2", "INV-3"]
+
+
+@pytest.mark.parametrize("columns", [",", " "])
+def test_empty_projection_returns_all_columns(client, columns):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    table = read_arrow(client, columns=columns)
+    assert table.num_rows == 3
+    assert "emissions_kg_co2e" in table.schema.names
+
+
+def test_inflight_read_survives_reexport(client):
+    client.post("/api/export-parquet", json=TRANSACTIONS)
+    scanner, snapshot = build_scanner(settings.export_dir, ["id"])
+    stream = ipc_stream(scanner.projected_schema, scan_batches(scanner, snapshot))
+    client.post("/api/export-parquet", json=[TRANSACTIONS[0]])
+    client.post("/api/export-parquet", json=[TRANSACTIONS[2]])
+    assert snapshot.exists()
+    table = pa.ipc.open_stream(b"".join(stream)).read_all()
+    assert sorted(table["id"].to_pylist()) == ["INV-1", "INV-2", "INV-3"]
+    client.post("/api/export-parquet", json=[TRANSACTIONS[1]])
+    assert not snapshot.exists()
+    assert len(list(settings.export_dir.glob("snapshot-*"))) == 1